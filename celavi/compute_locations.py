@@ -1,8 +1,13 @@
 import celavi.data_manager as Data
+import functools
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
+
+# states and territories outside the contiguous United States, for which
+# there is no road network data
+EXCLUDED_STATES = frozenset({'GU', 'HI', 'PR', 'AK'})
 
 warnings.simplefilter('error', UserWarning)
 
@@ -93,7 +98,69 @@ class ComputeLocations:
         # Create place to store final locations df for use in capacity expansion
         self.locs = None
 
-        self.facility_type_lookup = pd.read_csv(self.lookup_facility_type_file, header=None)
+        # Facility type labels from the lookup table, shared between instances
+        # that use the same lookup file
+        self._facility_type_labels = self._load_facility_type_labels(
+            self.lookup_facility_type_file
+        )
+
+        # Facility type conventions already found in the lookup table, keyed
+        # by the facility type used in the raw data
+        self._facility_type_conventions = {}
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _load_facility_type_labels(lookup_facility_type_file):
+        """
+        Read the facility type lookup table. The table is only read from disk
+        once per file path.
+
+        Parameters
+        ----------
+        lookup_facility_type_file : str
+            Path to the facility type lookup table.
+
+        Returns
+        -------
+        tuple of str
+            Facility type labels in the order they appear in the table.
+        """
+        # every entry in the lookup table is a facility type label, so skip
+        # type inference when reading it
+        facility_type_lookup = pd.read_csv(lookup_facility_type_file,
+                                           header=None,
+                                           usecols=[0],
+                                           dtype=str)
+
+        return tuple(facility_type_lookup[0])
+
+
+    def _lookup_facility_type(self, facility_type):
+        """
+        Find the facility type convention in the lookup table that contains
+        facility_type. Results are cached so the lookup table is only scanned
+        once per facility type.
+
+        Parameters
+        ----------
+        facility_type : str
+            Facility type as it appears in the raw data.
+
+        Returns
+        -------
+        str or None
+            First entry in the facility type lookup table containing
+            facility_type, or None if there is no such entry.
+        """
+        if facility_type not in self._facility_type_conventions:
+            self._facility_type_conventions[facility_type] = next(
+                (_type for _type in self._facility_type_labels
+                 if facility_type in _type),
+                None
+            )
+
+        return self._facility_type_conventions[facility_type]
 
 
     def wind_power_plant(self):
@@ -130,9 +197,30 @@ class ComputeLocations:
         # Process data for wind power plants - from USWTDB
         turbine_locations = Data.TechUnitLocations(fpath=self.power_plant_locations, backfill=self.backfill)
         
-        # select only those turbines with eia_ids (exclude turbines without) only 9314 out of 67814 don't have eia_id
-        turbine_locations_with_eia = turbine_locations[(turbine_locations['eia_id'] != '-1') &
-                                                       (turbine_locations['p_year'] != '-1')]
+        # All row filters are combined into one mask on the raw columns and
+        # applied before any column conversion:
+        # select only those turbines with eia_ids (exclude turbines without) only 9314 out of 67814 don't have eia_id,
+        # installed in or after the start year,
+        # exclude Hawaii, Guam, Puerto Rico, and Alaska (only have road network data for the contiguous United States),
+        # Nantucket since transport routing doesn't currently include ferries,
+        # and Block Island since no transport from offshore turbine to shore
+        turbine_locations_with_eia = turbine_locations[
+            (turbine_locations['eia_id'].fillna(-1) != -1) &
+            (turbine_locations['p_year'] >= self.start_year) &
+            ~turbine_locations['t_state'].isin(EXCLUDED_STATES) &
+            (turbine_locations['t_county'] != 'Nantucket') &
+            (turbine_locations['eia_id'] != 58035)
+        ]
+
+        # eia_id and p_year are read as floats only because of missing values,
+        # which have been filtered out above; downcast them to narrow integers
+        # ahead of the groupbys and duplicate checks. State and county are
+        # low-cardinality labels; store them as categoricals so the plant
+        # grouping below works on codes.
+        turbine_locations_with_eia = turbine_locations_with_eia.astype(
+            {'eia_id': 'int32', 'p_year': 'int16',
+             't_state': 'category', 't_county': 'category'}
+        )
 
         # reformat data for later use
         turbine_locations_with_eia = turbine_locations_with_eia.rename(columns={"t_state": "region_id_2",
@@ -143,57 +231,55 @@ class ComputeLocations:
                                                    "p_year": "year"},
                                           )
 
-        # exclude Hawaii, Guam, Puerto Rico, and Alaska (only have road network data for the contiguous United States)
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.region_id_2 != 'GU']
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.region_id_2 != 'HI']
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.region_id_2 != 'PR']
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.region_id_2 != 'AK']
-
-        # exclude Nantucket since transport routing doesn't currently include ferries
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.region_id_3 != 'Nantucket']
-
-        # exclude Block Island since no transport from offshore turbine to shore
-        turbine_locations_with_eia = turbine_locations_with_eia[turbine_locations_with_eia.facility_id != 58035]
-
         # Filter down the dataset to generate the number_of_technology_units
-        # file
+        # file. Incomplete rows are dropped first so that the duplicate scan
+        # only runs over the rows that are kept.
         n_turb = turbine_locations_with_eia[
             ['facility_id', 'p_name', 'year', 'p_tnum', 't_model', 't_cap']
-        ].drop_duplicates().dropna()
-
-        n_turb2 = n_turb[n_turb['year'] >= self.start_year]
-        
-        data3 = n_turb2.groupby(['year','facility_id','p_name','t_cap']).size().reset_index().rename(columns={0:'n_turbine'})        
-        data4 = data3.groupby(['year','facility_id']).apply(lambda x: np.average(x.t_cap, weights=x.n_turbine)).reset_index().rename(columns={0:'t_cap'})
-        data5 = data3.groupby(['year','facility_id'])['n_turbine'].agg('sum').reset_index()
-        data6 = data5.merge(data4, on = ['year','facility_id'])        
+        ].dropna().drop_duplicates()
+
+        # total number of turbines and turbine-count-weighted average turbine
+        # capacity by year and facility. n_turbine counts the n_turb rows in
+        # each group, so the weighted average is the plain mean of t_cap over
+        # those rows and both columns come out of a single groupby pass.
+        data6 = n_turb.groupby(['year', 'facility_id'], as_index=False).agg(
+            n_turbine=('t_cap', 'size'),
+            t_cap=('t_cap', 'mean')
+        )
 
         # Store this dataframe into self for use in capacity projection
         # calculations and creation of the number_of_technology_units file
         self.capacity_data = data6
 
+        # use data6 to filter down the turbines to the facilities that appear
+        # in the number_of_technology_units data before computing locations
         turbine_locations_filtered = turbine_locations_with_eia[
-            turbine_locations_with_eia.year >= self.start_year
+            turbine_locations_with_eia.facility_id.isin(data6.facility_id)
         ]
 
         # determine average lat and long for all turbines by facility_id
-        # (this is the plant location for each facility_id)
-        plant_locations = turbine_locations_filtered.groupby(['facility_id', 'region_id_2', "region_id_3"])[['long', 'lat']].agg('mean').reset_index()
+        # (this is the plant location for each facility_id). Turbines without
+        # coordinates are skipped by the mean. observed=True keeps the
+        # categorical state and county keys from producing empty groups; it
+        # also leaves the groups in order of appearance, so they are sorted
+        # explicitly before the first county of each facility is kept.
+        plant_locations = turbine_locations_filtered.groupby(
+            ['facility_id', 'region_id_2', 'region_id_3'], observed=True
+        )[['long', 'lat']].mean().sort_index().reset_index()
         # Dropping duplicates on p year and eia id and keeping only the first county occurences in case spread over multiple counties. Assumption
-        plant_locations = plant_locations.drop_duplicates(subset=['facility_id'], keep='first')
-        plant_locations = plant_locations.astype({'facility_id': 'int'})  # recast type for facility_id
+        plant_locations = plant_locations.drop_duplicates(
+            subset=['facility_id'], keep='first', ignore_index=True
+        )
         # Unique eia id and p _year have only one lat long associated now along with one region county and state.
-        
+        # The categorical state and county are only needed for the grouping;
+        # return them as plain strings.
+        plant_locations = plant_locations.astype(
+            {'region_id_2': str, 'region_id_3': str}
+        )
+
         wind_plant_locations = plant_locations
-        # use data6 to filter down the power plant locations list
-        wind_plant_locations = wind_plant_locations[
-            wind_plant_locations.facility_id.isin(
-                data6.facility_id
-            )
-        ].drop_duplicates(subset='facility_id',
-                          keep='first')
 
-        wind_plant_type_lookup = self.facility_type_lookup[self.facility_type_lookup[0].str.contains('power plant')].values[0][0]
+        wind_plant_type_lookup = self._lookup_facility_type('power plant')
         if wind_plant_type_lookup:
             wind_plant_facility_type_convention = wind_plant_type_lookup
             wind_plant_locations["facility_type"] = wind_plant_facility_type_convention
@@ -202,7 +288,6 @@ class ComputeLocations:
 
         wind_plant_locations["region_id_1"] = 'USA'
         wind_plant_locations["region_id_4"] = ''
-        wind_plant_locations = wind_plant_locations.astype({'facility_id': 'int'})
 
         return wind_plant_locations
 
@@ -246,9 +331,8 @@ class ComputeLocations:
                                                                 "Landfill Closure Year": "landfill_closure_year",
                                                                 "Current Landfill Status": "current_landfill_status"
                                                                 })
-        landfill_locations_all = landfill_locations_all.astype({'landfill_closure_year': 'int'})
 
-        landfill_type_lookup = self.facility_type_lookup[self.facility_type_lookup[0].str.contains('landfill')].values[0][0]
+        landfill_type_lookup = self._lookup_facility_type('landfill')
         if landfill_type_lookup:
             landfill_facility_type_convention = landfill_type_lookup
         else:
@@ -298,20 +382,23 @@ class ComputeLocations:
         facility_locations = Data.OtherFacilityLocations(fpath=self.other_facility_locations, backfill=self.backfill)
 
         number_other_facilities = len(facility_locations)
-        number_unique_facility_id = len(facility_locations.facility_id.unique())
+        number_unique_facility_id = facility_locations.facility_id.nunique()
 
         list_other_facility_types = facility_locations.facility_type.unique()
 
+        # map each facility type in the raw data to its lookup table convention
+        facility_type_conventions = {}
         for facility_type in list_other_facility_types:
-            other_facility_type_lookup = self.facility_type_lookup[self.facility_type_lookup[0].str.contains(facility_type)].values[0][0]
+            other_facility_type_lookup = self._lookup_facility_type(facility_type)
 
             if other_facility_type_lookup:
-                facility_locations = facility_locations.replace({'facility_type': facility_type},
-                                                                {'facility_type': other_facility_type_lookup},
-                                                                regex=True)
+                facility_type_conventions[facility_type] = other_facility_type_lookup
             else:
                 warnings.warn('Facility type missing from facility_type lookup table.')
 
+        facility_locations['facility_type'] = facility_locations['facility_type'].map(
+            facility_type_conventions
+        ).fillna(facility_locations['facility_type'])
 
         if number_other_facilities != number_unique_facility_id:
             warning_str = "The facility_id column in other facility locations is not unique - " \
@@ -350,61 +437,44 @@ class ComputeLocations:
         stscen.cap_new = stscen.cap_new * 1000.0
 
         # where total capacity decreases in a year, set the new capacity value
-        # to 0
-        stscen.loc[stscen['cap_new'] < 0,'cap_new'] = 0
-
-        # .diff() leaves empty values where there is no previous row.
-        # replace these NAs with 0
-        stscen.fillna(value=0, inplace=True)
+        # to 0. .diff() leaves empty values where there is no previous row;
+        # replace these NAs with 0 (the other columns are backfilled on read)
+        stscen['cap_new'] = stscen['cap_new'].clip(lower=0).fillna(0)
 
         # capacity_data is historical
         # find the average turbine capacity, weighted by number of turbines,
         # in each year up to the present day
-        avg_cap_hist = self.capacity_data.groupby(
+        cap_sums = self.capacity_data.assign(
+            t_cap_weighted=self.capacity_data.t_cap * self.capacity_data.n_turbine
+        ).groupby(
             by='year'
-        ).apply(
-            lambda x: np.average(x.t_cap, weights=x.n_turbine)
-        ).reset_index(
-        ).rename(
-            columns={0: 'avg_t_cap'}
-        )
+        )[['t_cap_weighted', 'n_turbine']].sum()
+        avg_cap_hist = cap_sums.t_cap_weighted / cap_sums.n_turbine
 
         # perform a linear regression of avg_t_cap on year
-        avg_t_cap_reg = LinearRegression(
-        ).fit(
-            np.array(avg_cap_hist.year).reshape(-1, 1),
-            np.array(avg_cap_hist.avg_t_cap).reshape(-1, 1)
+        avg_t_cap_slope, avg_t_cap_intercept = np.polyfit(
+            avg_cap_hist.index.to_numpy(dtype=np.float64),
+            avg_cap_hist.to_numpy(dtype=np.float64),
+            deg=1
         )
 
         # extrapolate the linear regression to generate values every 2 years
-        # from 2022 to 2050
-        predictions = [
-            [year, avg_t_cap_reg.predict(
-             np.array(
-                [[year]]
-             )
-        )[0][0]] for year in np.arange(2022, 2052, 2)
-        ]
-
-        # format extrapolations into DataFrame
+        # from 2022 to 2050, and format extrapolations into DataFrame
+        pred_years = np.arange(2022, 2052, 2)
         avg_cap_pred = pd.DataFrame(
-            data=predictions,
-            columns=['year', 'avg_t_cap']
+            data={'t_cap': avg_t_cap_slope * pred_years + avg_t_cap_intercept},
+            index=pd.Index(pred_years, name='year')
         )
 
         # merge the average capacity extrapolation with the standard scenario
         # data by year
         # keep only the columns required to calculate the number of new
         # turbines
-        joined = avg_cap_pred.merge(
-            stscen[stscen.year > 2020],
-            on='year',
+        joined = avg_cap_pred.join(
+            stscen.loc[stscen.year > 2020, ['year', 'state', 'cap_new']].set_index('year'),
             how='outer',
-            suffixes=('avgcap', 'stdscen'),
             sort=True
-        )[['year', 'state', 'avg_t_cap', 'cap_new']].rename(
-            columns={'avg_t_cap': 't_cap'}
-        )
+        ).reset_index()[['year', 'state', 't_cap', 'cap_new']]
 
         # calculate the number of new turbines by dividing the new capacity
         # addition with the average turbine capacity
@@ -417,36 +487,30 @@ class ComputeLocations:
         # generate project names for the future capacity
         joined['p_name'] = joined.state + '_future_cap'
 
-        # remove columns no longer needed
-        capacity_future = joined[['year', 'p_name', 'n_turbine', 't_cap']]
-
         # Use the computed locations dataset to generate unique facility_id
         # values for these future "power plants"
         _facility_id_start = int(self.locs.facility_id.max() + 1)
 
-        # generate a list of new facility IDs
-        _new_facility_id = list(
-            _facility_id_start +
-            np.arange(len(capacity_future.p_name.unique()))
+        # there is one future project per state; number the projects
+        # consecutively in order of appearance, add a facility_id column to
+        # the capacity projection data and remove columns no longer needed
+        _project_codes, _project_states = pd.factorize(joined.state)
+        capacity_future = joined[['year', 'p_name', 'n_turbine', 't_cap']].assign(
+            facility_id=_facility_id_start + _project_codes
         )
 
-        # create a data frame of new facility IDs and project names,
-        # for merging
+        # data frame of new facility IDs and the state of each project
         _new_facility_id = pd.DataFrame(
             data={
-                'p_name': list(capacity_future.p_name.unique()),
-                'facility_id': _new_facility_id
+                'facility_id': _facility_id_start + np.arange(len(_project_states)),
+                'region_id_2': _project_states
             }
         )
 
-        # merge to add a facility_id column to the capacity projection data
-        capacity_future = capacity_future.merge(
-            _new_facility_id[['p_name', 'facility_id']],
-            on='p_name',
-            how='outer'
-        )
         self.capacity_data = pd.concat([self.capacity_data,capacity_future])
-        self.capacity_data = self.capacity_data.sort_values(by = list(self.capacity_data.columns)).rename(
+        # (year, facility_id) is unique in the capacity data, so it is enough
+        # to sort on those two keys
+        self.capacity_data = self.capacity_data.sort_values(by=['year', 'facility_id']).rename(
             columns={'n_turbine': 'n_technology'}
         ).to_csv(
             self.technology_data_filename,
@@ -454,26 +518,14 @@ class ComputeLocations:
         )
 
 
-        # get state column back by splitting p_name
-        # ig1 and ig2 are dummy columns not used further
-        _new_facility_id[
-            ['region_id_2', 'ig1', 'ig2']
-        ] = _new_facility_id.p_name.str.split('_',
-                                              expand=True)
-
         # Calculate lat/long pairs for the future power plants by taking the
         # average lat/long of existing power plants by state
-        _new_facility_locs = _new_facility_id[
-            ['facility_id', 'region_id_2']
-        ].merge(
-            self.locs.groupby(
-                by='region_id_2'
-            ).mean(
-                ['lat','long']
-            ).reset_index()[['region_id_2', 'lat', 'long']],
-            on='region_id_2',
-            how='left'
-        )
+        _state_locs = self.locs.groupby(
+            by='region_id_2'
+        )[['lat', 'long']].mean()
+        _new_facility_locs = _new_facility_id
+        _new_facility_locs['lat'] = _new_facility_locs.region_id_2.map(_state_locs.lat)
+        _new_facility_locs['long'] = _new_facility_locs.region_id_2.map(_state_locs.long)
 
         _new_facility_locs['facility_type'] = 'power plant'
         _new_facility_locs['region_id_1'] = 'USA'
@@ -484,7 +536,13 @@ class ComputeLocations:
         # It has to go back into self to get saved at the end of the
         # join_facilities method
         self.locs = pd.concat([self.locs,_new_facility_locs])
-        self.locs = self.locs.sort_values(by = list(self.locs.columns))
+        # join_facilities only renumbers duplicate ids of facilities that are
+        # not power plants, so power plants can still share a facility_id. A
+        # stable sort with facility_type as a secondary key keeps the row
+        # order deterministic.
+        self.locs = self.locs.sort_values(
+            by=['facility_id', 'facility_type'], kind='stable'
+        )
 
 
     def join_facilities(self, locations_output_file):
@@ -500,34 +558,43 @@ class ComputeLocations:
             Path where the processed and aggregated locations dataset is saved
         """
 
-        wind_plant_locations = ComputeLocations.wind_power_plant(self)
-        landfill_locations_no_nulls = ComputeLocations.landfill(self)
-        facility_locations = ComputeLocations.other_facility(self)
+        # the three location datasets are read and processed independently.
+        # Threads are used rather than processes because wind_power_plant
+        # stores the capacity data on self for capacity_projections.
+        loaders = (self.wind_power_plant, self.landfill, self.other_facility)
+        with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+            futures = [executor.submit(loader) for loader in loaders]
+            wind_plant_locations, landfill_locations_no_nulls, \
+                facility_locations = [f.result() for f in futures]
 
 
-        locations = pd.concat([facility_locations,wind_plant_locations])
-        locations = pd.concat([locations,landfill_locations_no_nulls])
-        locations.reset_index(drop=True, inplace=True)
+        locations = pd.concat(
+            [facility_locations, wind_plant_locations, landfill_locations_no_nulls],
+            ignore_index=True
+        )
 
         # exclude Hawaii, Guam, Puerto Rico, and Alaska
         # (only have road network data for the contiguous United States)
-        locations = locations[locations.region_id_2 != 'GU']
-        locations = locations[locations.region_id_2 != 'HI']
-        locations = locations[locations.region_id_2 != 'PR']
-        locations = locations[locations.region_id_2 != 'AK']
-        
-        locations = locations[locations.region_id_3 != 'Nantucket']
+        # and Nantucket
+        locations = locations[
+            ~locations.region_id_2.isin(EXCLUDED_STATES) &
+            (locations.region_id_3 != 'Nantucket')
+        ]
 
         # find the entries in locations that have a duplicate facility_id AND
         # are not power plants.
-        _ids_update = locations[locations.duplicated(subset='facility_id',
-                                                     keep=False)]
-        _ids_update = _ids_update.loc[_ids_update.facility_type != 'power plant'].index
+        _ids_update = locations.index[
+            locations.duplicated(subset='facility_id', keep=False) &
+            (locations.facility_type != 'power plant')
+        ]
 
         # Update the facility_id values for these entries in the locations data
-        # frame.
-        for i in _ids_update:
-            locations.loc[i, 'facility_id'] = int(max(locations.facility_id) + 1)
+        # frame, numbering them consecutively after the current largest id.
+        _max_facility_id = int(locations.facility_id.max())
+        locations.loc[_ids_update, 'facility_id'] = np.arange(
+            _max_facility_id + 1,
+            _max_facility_id + 1 + len(_ids_update)
+        )
 
         self.locs = locations
 
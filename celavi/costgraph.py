@@ -2,13 +2,32 @@ from typing import List, Union
 import networkx as nx
 import pandas as pd
 import numpy as np
-from itertools import product
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, bellman_ford
+from itertools import chain, product
 from time import time
-from networkx_query import search_nodes
 
 from celavi.costmethods import CostMethods
 
 
+# cost methods whose result does not depend on year, mass or distance
+STATIC_COST_METHODS = frozenset({"zero_method"})
+
+# columns of the pathway criterion history, in the order they are saved
+PATHWAY_CRIT_HISTORY_COLUMNS = (
+    "year",
+    "source_facility_id",
+    "destination_facility_id",
+    "region_id_1",
+    "region_id_2",
+    "region_id_3",
+    "region_id_4",
+    "eol_pathway_type",
+    "eol_pathway_criterion",
+    "bol_pathway_criterion",
+)
+
+
 class CostGraph:
     """
     Reads in supply chain data, creates a network of processing steps and facilities
@@ -105,14 +124,40 @@ class CostGraph:
         self.fac_edges = pd.read_csv(fac_edges_file)
         self.transpo_edges = pd.read_csv(transpo_edges_file)
 
+        # resolve every cost method named in the input data once
+        self._method_by_name = {
+            name: getattr(self.cost_methods, name)
+            for name in pd.concat(
+                [
+                    self.step_costs["step_cost_method"],
+                    self.transpo_edges["transpo_cost_method"],
+                ]
+            )
+            .dropna()
+            .unique()
+        }
+
         # these data sets are processed line by line
         self.loc_file = locations_file
         self.routes_file = routes_file
 
-        # also read in the locations as a dataframe for reference in
-        # find_nearest
+        # also read in the locations as a dataframe; facility subgraphs are
+        # built from its rows
         self.loc_df = pd.read_csv(locations_file)
 
+        # region identifiers by facility ID for the pathway criterion history
+        self._loc_by_fid = {
+            row.facility_id: (
+                row.region_id_1,
+                row.region_id_2,
+                row.region_id_3,
+                row.region_id_4,
+            )
+            for row in self.loc_df.drop_duplicates(subset="facility_id").itertuples(
+                index=False
+            )
+        }
+
         self.sc_end = sc_end + sc_out_circ
         self.sc_begin = sc_begin + sc_in_circ
         
@@ -133,8 +178,8 @@ class CostGraph:
 
         self.pathway_crit_history_filename = pathway_crit_history_filename
         self.run = run
-        # create empty List to store the pathway cost output data
-        self.pathway_crit_history = list()
+        # create empty columns to store the pathway cost output data
+        self.reset_crit_history()
 
         # create empty instance variable for supply chain DiGraph
         self.supply_chain = nx.DiGraph()
@@ -145,6 +190,46 @@ class CostGraph:
         if save_copy:
             nx.write_edgelist(self.supply_chain, save_name, delimiter=",")
 
+    @property
+    def pathway_crit_history(self):
+        """
+        History of the criterion used to decide between end-of-life
+        pathways, with one row per source facility, end-of-life pathway type
+        and call to find_nearest. The history is stored by column and
+        assembled into a DataFrame when accessed; use reset_crit_history to
+        clear it.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with the PATHWAY_CRIT_HISTORY_COLUMNS. The
+            destination_facility_id and eol_pathway_criterion columns hold
+            lists.
+        """
+        return pd.DataFrame(self._crit_history, columns=PATHWAY_CRIT_HISTORY_COLUMNS)
+
+    def reset_crit_history(self):
+        """
+        Clears the history of the criterion used to decide between end-of-life
+        pathways. The history is stored by column, with one entry per source
+        facility, end-of-life pathway type and call to find_nearest; the
+        destination_facility_id and eol_pathway_criterion entries are lists.
+        """
+        self._crit_history = {_col: [] for _col in PATHWAY_CRIT_HISTORY_COLUMNS}
+
+    def _extend_crit_history(self, records: list):
+        """
+        Appends records to the pathway criterion history columns.
+
+        Parameters
+        ----------
+        records : list
+            List of dictionaries keyed by PATHWAY_CRIT_HISTORY_COLUMNS.
+        """
+        for _record in records:
+            for _col, _values in self._crit_history.items():
+                _values.append(_record[_col])
+
     @staticmethod
     def get_node_names(facilityID: List[Union[int, str]], subgraph_steps: list):
         """
@@ -166,79 +251,146 @@ class CostGraph:
         """
         return ["{}_{}".format(i, str(facilityID)) for i in subgraph_steps]
 
-    def all_element_combos(self, list1: list, list2: list):
+    def _build_csr(self):
+        """
+        Mirrors the supply chain topology as compressed sparse row (CSR)
+        arrays so that traversals do not need to walk the DiGraph's nested
+        dictionaries. Must be called whenever edges are added to or removed
+        from the supply chain.
+        """
+        self._node_names = list(self.supply_chain.nodes)
+        self._node_idx = {n: i for i, n in enumerate(self._node_names)}
+
+        _u = np.array(
+            [self._node_idx[u] for u, v in self.supply_chain.edges()], dtype=np.int32
+        )
+        _v = np.array(
+            [self._node_idx[v] for u, v in self.supply_chain.edges()], dtype=np.int32
+        )
+
+        # order edges by their source node
+        self._csr_order = np.argsort(_u, kind="stable")
+        self._indices = _v[self._csr_order]
+        self._indptr = np.zeros(len(self._node_names) + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(_u, minlength=len(self._node_names)), out=self._indptr[1:]
+        )
+
+        # position of each edge in the CSR data array
+        _pos = np.empty(len(self._csr_order), dtype=np.intp)
+        _pos[self._csr_order] = np.arange(len(self._csr_order))
+        self._csr_pos = dict(zip(self.supply_chain.edges(), _pos.tolist()))
+
+        # edge costs in CSR order; kept current by _calculate_costs
+        self._csr_costs = np.array(
+            [w for u, v, w in self.supply_chain.edges(data="cost", default=1)],
+            dtype=float,
+        )[self._csr_order]
+
+        # nodes where supply chain paths terminate
+        self._is_end = np.array(
+            [
+                data.get("step") in self.sc_end
+                for node, data in self.supply_chain.nodes(data=True)
+            ],
+            dtype=bool,
+        )
+        self._end_nodes = {self._node_names[i] for i in np.flatnonzero(self._is_end)}
+
+        # weighted CSR matrices, shortest path results and upstream neighbors
+        # are found on demand and cached until costs change
+        self._csr_graphs = {}
+        self._nearest_cache = {}
+        self._bol_lengths = {}
+        self._upstream_cache = {}
+
+    def _csr_graph(self, crit: str):
         """
-        Converts two lists into a list of tuples where each tuple contains
-        one element from each list:
-        [(list1[0], list2[0]), (list1[0], list2[1]), ...]
-        Exactly two lists of any length must be specified.
+        Returns the supply chain as a sparse matrix weighted by an edge
+        attribute.
 
         Parameters
         ----------
-        list1
-            list of any data type
-        list2
-            list of any data type
+        crit
+            Edge attribute used as the edge weight.
 
         Returns
         -------
-        A list of 2-tuples
+        scipy.sparse.csr_matrix
+            N x N matrix of edge weights, where N is the number of nodes.
+            Edges with a weight of zero are stored explicitly.
         """
-        if self.verbose > 1:
-            print("Getting node combinations")
+        if crit not in self._csr_graphs:
+            if crit == "cost":
+                _w = self._csr_costs.copy()
+            else:
+                _w = np.array(
+                    [w for u, v, w in self.supply_chain.edges(data=crit, default=1)],
+                    dtype=float,
+                )[self._csr_order]
+            self._csr_graphs[crit] = csr_matrix(
+                (_w, self._indices, self._indptr),
+                shape=(len(self._node_names), len(self._node_names)),
+            )
 
-        _out = []
-        _out = product(list1, list2)
+        return self._csr_graphs[crit]
 
-        return list(_out)
+    def _path_method(self, crit: str):
+        """
+        Choose the shortest path algorithm for the current edge weights.
+        Dijkstra's algorithm is used unless any edge has a negative crit
+        value (e.g., revenue from coprocessing), in which case Bellman-Ford
+        is required.
 
-    def list_of_tuples(
-        self, list1: list, list2: list, list3: list = None, list4: list = None
-    ):
+        Parameters
+        ----------
+        crit
+            Edge attribute used as the path "length".
+
+        Returns
+        -------
+        str
+            "dijkstra" or "bellman-ford"
         """
-        Converts two or three lists into a list of two- or three-tuples where
-        each tuple contains the corresponding elements from each list:
-        [(list1[0], list2[0]), (list1[1], list2[1]), ...] or
-        [(list1[0], list2[0], list3[0]), (list1[1], list2[1], list3[1]), ...]
+        if np.all(self._csr_graph(crit).data >= 0):
+            return "dijkstra"
+        else:
+            return "bellman-ford"
 
-        Two or three lists may be specified. All three lists must be the same
-        length.
+    def _shortest_paths(self, source: str, crit: str):
+        """
+        Calculates the shortest path lengths from one node to every other
+        node in the supply chain.
 
         Parameters
         ----------
-        list1
-            list of any data type
-        list2
-            list of any data type
-        list3
-            list of any data type (optional)
-        list4
-            list of any data type
+        source
+            Name of node where the paths begin.
+        crit
+            Edge attribute used as the path "length".
 
         Returns
         -------
-        A list of n-tuples where n can be 2, 3, or 4
+        [0] np.ndarray of path lengths to every node, in CSR node order.
+            Unreachable nodes have a length of inf.
+        [1] np.ndarray of the predecessor of every node along its path.
+            The source and unreachable nodes have a predecessor of -9999.
         """
-
-        if list3 is not None and list4 is None:
-            _len = len(list1)
-            if any(len(lst) != _len for lst in [list1, list2, list3]):
-                raise NotImplementedError
-            else:
-                return list(map(lambda x, y, z: (x, y, z), list1, list2, list3))
-        elif list3 is not None and list4 is not None:
-            _len = len(list1)
-            if any(len(lst) != _len for lst in [list1, list2, list3, list4]):
-                raise NotImplementedError
-            else:
-                return list(
-                    map(lambda w, x, y, z: (w, x, y, z), list1, list2, list3, list4)
-                )
+        if source not in self._node_idx:
+            raise nx.NodeNotFound(f"Source {source} is not in G")
+
+        if self._path_method(crit) == "dijkstra":
+            return dijkstra(
+                self._csr_graph(crit),
+                indices=self._node_idx[source],
+                return_predecessors=True,
+            )
         else:
-            if len(list1) != len(list2):
-                raise NotImplementedError
-            else:
-                return list(map(lambda x, y: (x, y), list1, list2))
+            return bellman_ford(
+                self._csr_graph(crit),
+                indices=self._node_idx[source],
+                return_predecessors=True,
+            )
 
     def find_nearest(self, source: str, crit: str):
         """
@@ -265,89 +417,107 @@ class CostGraph:
         if self.verbose > 1:
             print("Finding shortest paths from", source)
 
-        # Calculate the length of paths from fromnode to all other nodes
-        lengths = nx.single_source_bellman_ford_path_length(
-            self.supply_chain, source, weight=crit
-        )
+        # Paths do not change until the edge costs are updated, so repeated
+        # queries from the same source are answered from the cache
+        if (source, crit) in self._nearest_cache:
+            _nearest, _length, _out, _history = self._nearest_cache[(source, crit)]
+            self._extend_crit_history(_history)
+            return _nearest, _length, _out
 
-        short_paths = nx.single_source_bellman_ford_path(self.supply_chain, source)
+        # Calculate the length of paths from fromnode to all other nodes, and
+        # the predecessor of each node along those paths
+        _lengths, _pred = self._shortest_paths(source, crit)
 
         # We are only interested in a particular type(s) of node
-        targets = list(
-            search_nodes(self.supply_chain, {"in": [("step",), self.sc_end]})
+        _targets = np.flatnonzero(self._is_end & np.isfinite(_lengths))
+        subdict = dict(
+            zip(
+                [self._node_names[i] for i in _targets], _lengths[_targets].tolist()
+            )
         )
 
-        subdict = {k: v for k, v in lengths.items() if k in targets}
-
         # return the smallest of all lengths to get to typeofnode
         if subdict:
-            # dict of shortest paths to all targets
-            nearest = min(subdict, key=subdict.get)
-            timeout = nx.get_node_attributes(self.supply_chain, "timeout")
-            timeout_list = [
-                value for key, value in timeout.items() if key in short_paths[nearest]
+            _nearest_idx = _targets[np.argmin(_lengths[_targets])]
+            nearest = self._node_names[_nearest_idx]
+
+            # walk the predecessors back from the nearest target
+            _path = [_nearest_idx]
+            while _pred[_path[-1]] >= 0:
+                _path.append(_pred[_path[-1]])
+            _path = [self._node_names[i] for i in reversed(_path)]
+
+            # look up each edge along the path once for its distance and route
+            _path_edges = [
+                self.supply_chain.adj[u][v] for u, v in zip(_path[:-1], _path[1:])
             ]
-            dist_list = [
-                self.supply_chain.edges[short_paths[nearest][d : d + 2]]["dist"]
-                for d in range(len(short_paths[nearest]) - 1)
-            ]
-            dist_list.insert(0, 0.0)
-            route_id_list = [
-                self.supply_chain.edges[short_paths[nearest][d : d + 2]]["route_id"]
-                for d in range(len(short_paths[nearest]) - 1)
-            ]
-            route_id_list.insert(0, None)
-            _out = self.list_of_tuples(
-                short_paths[nearest], timeout_list, dist_list, route_id_list
-            )
+            timeout_list = [self.supply_chain.nodes[n]["timeout"] for n in _path]
+            dist_list = [0.0] + [_edge["dist"] for _edge in _path_edges]
+            route_id_list = [None] + [_edge["route_id"] for _edge in _path_edges]
+            _out = list(zip(_path, timeout_list, dist_list, route_id_list))
 
             # create dictionary for this preferred pathway cost and decision
             # criterion and append to the pathway_crit_history
             _fac_id = self.supply_chain.nodes[source]["facility_id"]
-            _loc_line = self.loc_df[self.loc_df.facility_id == _fac_id]
-            _bol_crit = nx.shortest_path_length(
-                self.supply_chain,
-                source="manufacturing_"
-                + str(self.find_upstream_neighbor(node_id=_fac_id, crit="cost")),
-                target=str(source),
-                weight=crit,
-                method="bellman-ford",
-            )
+            _region_1, _region_2, _region_3, _region_4 = self._loc_by_fid[_fac_id]
 
+            # Path lengths from a manufacturing node are shared by every
+            # source it supplies, so they are kept until costs change
+            _bol_source = "manufacturing_" + str(
+                self.find_upstream_neighbor(node_id=_fac_id, crit="cost")
+            )
+            if (_bol_source, crit) not in self._bol_lengths:
+                self._bol_lengths[(_bol_source, crit)] = self._shortest_paths(
+                    _bol_source, crit
+                )[0]
+            _bol_crit = self._bol_lengths[(_bol_source, crit)][self._node_idx[source]]
+            if np.isinf(_bol_crit):
+                raise nx.NetworkXNoPath(f"No path between {_bol_source} and {source}.")
+            _bol_crit = float(_bol_crit)
+
+            _history = []
             for i in self.sc_end:
                 _dest = [key for key, value in subdict.items() if i in key]
                 _crit = [value for key, value in subdict.items() if i in key]
                 if len(_crit) > 0:
-                    self.pathway_crit_history.append(
+                    _history.append(
                         {
                             "year": self.year,
                             "source_facility_id": _fac_id,
                             "destination_facility_id": _dest,
-                            "region_id_1": _loc_line.region_id_1.values[0],
-                            "region_id_2": _loc_line.region_id_2.values[0],
-                            "region_id_3": _loc_line.region_id_3.values[0],
-                            "region_id_4": _loc_line.region_id_4.values[0],
+                            "region_id_1": _region_1,
+                            "region_id_2": _region_2,
+                            "region_id_3": _region_3,
+                            "region_id_4": _region_4,
                             "eol_pathway_type": i,
                             "eol_pathway_criterion": _crit,
                             "bol_pathway_criterion": _bol_crit,
                         }
                     )
+            self._extend_crit_history(_history)
 
+            self._nearest_cache[(source, crit)] = (
+                nearest,
+                subdict[nearest],
+                _out,
+                _history,
+            )
             return nearest, subdict[nearest], _out
         else:
             # not found, no path from source to typeofnode
+            self._nearest_cache[(source, crit)] = (None, None, None, [])
             return None, None, None
 
-    def get_edges(self, facility_df: pd.DataFrame, u_edge="step", v_edge="next_step"):
+    def get_edges(self, facility: dict, u_edge="step", v_edge="next_step"):
         """
         Converts two columns of node names into a list of string tuples
         for intra-facility edge definition with networkx
 
         Parameters
         ----------
-        facility_df
-            DataFrame listing processing steps (u_edge) and the next
-            processing step (v_edge) by facility type
+        facility
+            Dictionary defining a single supply chain facility, including its
+            facility_type
         u_edge
             unique processing steps within a facility type
         v_edge
@@ -358,36 +528,46 @@ class CostGraph:
             list of string tuples that define edges within a facility type
         """
         if self.verbose > 1:
-            print("Getting edges for ", facility_df["facility_type"].values[0])
+            print("Getting edges for ", facility["facility_type"])
+
+        _type = facility["facility_type"]
+
+        # every facility of a type has the same edges, so the edge list is
+        # only extracted once per type
+        if (_type, u_edge, v_edge) not in self._fac_edges_by_type:
+            self._fac_edges_by_type[(_type, u_edge, v_edge)] = (
+                self.fac_edges[[u_edge, v_edge]]
+                .loc[self.fac_edges.facility_type == _type]
+                .dropna()
+                .to_records(index=False)
+                .tolist()
+            )
 
-        _type = facility_df["facility_type"].values[0]
-
-        _out = (
-            self.fac_edges[[u_edge, v_edge]]
-            .loc[self.fac_edges.facility_type == _type]
-            .dropna()
-            .to_records(index=False)
-            .tolist()
-        )
+        _out = list(self._fac_edges_by_type[(_type, u_edge, v_edge)])
 
         return _out
 
-    def get_nodes(self, facility_df: pd.DataFrame):
+    def get_nodes(self, facility: dict):
         """
         Generates a data structure that defines all nodes and node attributes
         for a single facility.
 
         Parameters
         ----------
-        facility_df : pd.DataFrame
-            DataFrame containing unique facility IDs, processing steps, and
-            the name of the method (if any) used to calculate processing costs
+        facility : dict
+            Dictionary defining a single supply chain facility. Processing
+            steps and cost methods for the facility are looked up in the step
+            costs dataset by facility_id.
 
-            Columns:
+            Keys:
                 - facility_id : int
-                - step : str
-                - connects : str
-                - step_cost_method : str
+                - facility_type : str
+                - lat : float
+                - long : float
+                - region_id_1 : str
+                - region_id_2 : str
+                - region_id_3 : str
+                - region_id_4 : str
 
         Returns
         -------
@@ -397,47 +577,37 @@ class CostGraph:
             ID, and region identifiers.
         """
         if self.verbose > 1:
-            print(
-                "Getting nodes for facility ", str(facility_df["facility_id"].values[0])
-            )
+            print("Getting nodes for facility ", str(facility["facility_id"]))
 
-        _id = facility_df["facility_id"].values[0]
+        _id = facility["facility_id"]
 
-        # list of nodes (processing steps) within a facility
-        _node_names = (
-            self.step_costs["step"].loc[self.step_costs.facility_id == _id].tolist()
-        )
-
-        # data frame matching facility processing steps with methods for cost
+        # processing steps within a facility, with methods for cost
         # calculation over time
-        _step_cost = self.step_costs[
-            ["step", "step_cost_method", "facility_id", "connects"]
-        ].loc[self.step_costs.facility_id == _id]
+        _step_cost = self._steps_by_facility_id.get(_id, [])
 
-        _step_cost["timeout"] = 1
+        # list of nodes (processing steps) within a facility
+        _node_names = [_step["step"] for _step in _step_cost]
 
-        # create list of dictionaries from data frame with processing steps,
-        # cost calculation method, and facility-specific region identifiers
-        _attr_data = _step_cost.merge(
-            facility_df, how="outer", on="facility_id"
-        ).to_dict(orient="records")
+        # create list of dictionaries with processing steps, cost calculation
+        # method, and facility-specific region identifiers
+        _attr_data = [dict(_step, timeout=1, **facility) for _step in _step_cost]
 
         # reformat data into a list of tuples as (str, dict)
-        _nodes = self.list_of_tuples(self.get_node_names(_id, _node_names), _attr_data)
+        _nodes = list(zip(self.get_node_names(_id, _node_names), _attr_data))
 
         return _nodes
 
-    def build_facility_graph(self, facility_df: pd.DataFrame):
+    def build_facility_graph(self, facility: dict):
         """
         Creates networkx DiGraph object containing nodes, intra-facility edges,
         and all relevant attributes for a single facility.
 
         Parameters
         ----------
-        facility_df : pd.DataFrame
-            DataFrame with a single row that defines a supply chain facility.
+        facility : dict
+            Dictionary that defines a single supply chain facility.
 
-            Columns:
+            Keys:
                 - facility_id : int
                 - facility_type : str
                 - lat : float
@@ -453,18 +623,15 @@ class CostGraph:
             Directed graph representation of one supply chain facility.
         """
         if self.verbose > 1:
-            print(
-                "Building facility graph for ",
-                str(facility_df["facility_id"].values[0]),
-            )
+            print("Building facility graph for ", str(facility["facility_id"]))
 
         # Create empty directed graph object
         _facility = nx.DiGraph()
 
-        _id = str(facility_df["facility_id"].values[0])
+        _id = str(facility["facility_id"])
 
         # Generates list of (str, dict) tuples for node definition
-        _facility_nodes = self.get_nodes(facility_df)
+        _facility_nodes = self.get_nodes(facility)
 
         # Populate the directed graph with node names and attribute
         # dictionaries
@@ -473,41 +640,36 @@ class CostGraph:
         # Populate the directed graph with edges
         # Edges within facilities don't have transportation costs or distances
         # associated with them.
-        _edges = self.get_edges(facility_df)
+        _edges = self.get_edges(facility)
         _unique_edges = [tuple(map(lambda w: w + "_" + _id, x)) for x in _edges]
 
-        _methods = [
-            {
-                "cost_method": [
-                    getattr(
-                        self.cost_methods, _facility.nodes[edge[0]]["step_cost_method"]
-                    )
-                ],
-                "cost": 0.0,
-                "dist": 0.0,
-                "route_id": None,
-            }
-            for edge in _unique_edges
-        ]
-
         _facility.add_edges_from(
-            self.list_of_tuples(
-                [node[0] for node in _unique_edges],
-                [node[1] for node in _unique_edges],
-                _methods,
+            (
+                _u,
+                _v,
+                {
+                    "cost_method": [
+                        self._method_by_name[_facility.nodes[_u]["step_cost_method"]]
+                    ],
+                    "cost": 0.0,
+                    "dist": 0.0,
+                    "route_id": None,
+                },
             )
+            for _u, _v in _unique_edges
         )
 
         return _facility
 
     def build_supplychain_graph(self):
         """
-        Reads in the locations data set line by line. Each line becomes a
+        Processes the locations data set line by line. Each line becomes a
         DiGraph representing a single facility. Facility DiGraphs are
         added onto a supply chain DiGraph and connected with inter-facility
         edges. Edges within facilities have no cost or distance. Edges
         between facilities have costs defined in the interconnections
-        dataset and distances defined in the routes dataset.
+        dataset and distances defined in the routes dataset. Facilities
+        that are not connected by a route are not connected by an edge.
         """
         if self.verbose > 0:
             print(
@@ -516,20 +678,47 @@ class CostGraph:
                 flush=True,
             )
 
-        # add all facilities and intra-facility edges to supply chain
-        with open(self.loc_file, "r") as _loc_file:
-
-            _reader = pd.read_csv(_loc_file, chunksize=1)
+        # group the processing steps by facility and cache intra-facility
+        # edges by facility type, rather than filtering the full datasets
+        # once per facility
+        self._steps_by_facility_id = {}
+        for _step in self.step_costs[
+            ["step", "step_cost_method", "facility_id", "connects"]
+        ].to_dict(orient="records"):
+            self._steps_by_facility_id.setdefault(_step["facility_id"], []).append(
+                _step
+            )
+        self._fac_edges_by_type = {}
 
-            for _line in _reader:
+        # index nodes by processing step and by facility ID as they are added
+        self._nodes_by_step = {}
+        self._nodes_by_facility_id = {}
+        self._bid_node_by_facility_id = {}
 
-                # Build the subgraph representation and add it to the list of
-                # facility subgraphs
-                _fac_graph = self.build_facility_graph(facility_df=_line)
+        # neighbors of each node filtered by type are found on demand; the
+        # graph topology does not change once it is built
+        self._typed_neighbors = {}
 
-                # add onto the supply supply chain graph
-                self.supply_chain.add_nodes_from(_fac_graph.nodes(data=True))
-                self.supply_chain.add_edges_from(_fac_graph.edges(data=True))
+        # add all facilities and intra-facility edges to supply chain
+        for _line in self.loc_df.to_dict(orient="records"):
+
+            # Build the subgraph representation and add it to the list of
+            # facility subgraphs
+            _fac_graph = self.build_facility_graph(facility=_line)
+
+            # add onto the supply supply chain graph
+            self.supply_chain.add_nodes_from(_fac_graph.nodes(data=True))
+            self.supply_chain.add_edges_from(_fac_graph.edges(data=True))
+
+            for _node, _data in _fac_graph.nodes(data=True):
+                self._nodes_by_step.setdefault(_data["step"], []).append(_node)
+                self._nodes_by_facility_id.setdefault(
+                    _data["facility_id"], []
+                ).append(_node)
+                if _data["connects"] == "bid":
+                    self._bid_node_by_facility_id.setdefault(
+                        _data["facility_id"], _node
+                    )
 
         if self.verbose > 0:
             print(
@@ -537,13 +726,40 @@ class CostGraph:
                 % np.round(time() - self.start_time, 0),
                 flush=True,
             )
+            print(
+                "Reading route distances at       %d s"
+                % np.round(time() - self.start_time, 0),
+                flush=True,
+            )
+
+        # Only read in columns relevant to CostGraph building. Routes are
+        # keyed by source and destination facility ID; if a pair of
+        # facilities is listed more than once, the last route listed is used.
+        _routes = pd.read_csv(
+            self.routes_file,
+            usecols=[
+                "source_facility_id",
+                "destination_facility_id",
+                "total_vkmt",
+                "route_id",
+            ],
+        )
+        _routes = dict(
+            zip(
+                zip(_routes.source_facility_id, _routes.destination_facility_id),
+                zip(_routes.total_vkmt, _routes.route_id),
+            )
+        )
+
+        if self.verbose > 0:
             print(
                 "Adding transport cost methods at %d s"
                 % np.round(time() - self.start_time, 0),
                 flush=True,
             )
 
-        # add all inter-facility edges, with costs but without distances
+        # add all inter-facility edges, with costs and distances. Only
+        # facility pairs connected by a route are added to the supply chain.
         # this is a relatively short loop
         for index, row in self.transpo_edges.iterrows():
             if self.verbose > 1:
@@ -558,181 +774,222 @@ class CostGraph:
             _v = row["v_step"]
             _transpo_cost = row["transpo_cost_method"]
 
-            # get two lists of nodes to connect based on df row
-            _u_nodes = list(search_nodes(self.supply_chain, {"==": [("step",), _u]}))
-            _v_nodes = list(search_nodes(self.supply_chain, {"==": [("step",), _v]}))
-
-            # convert the two node lists to a list of tuples with all possible
-            # combinations of _u_nodes and _v_nodes
-            _edge_list = self.all_element_combos(_u_nodes, _v_nodes)
+            # get the facility IDs of the nodes to connect based on df row.
+            # Routes can only begin at nodes that connect out of a facility.
+            _u_fids = {
+                n: self.supply_chain.nodes[n]["facility_id"]
+                for n in self._nodes_by_step.get(_u, [])
+                if self.supply_chain.nodes[n]["connects"] in ["out", "bid"]
+            }
+            _v_fids = {
+                n: self.supply_chain.nodes[n]["facility_id"]
+                for n in self._nodes_by_step.get(_v, [])
+            }
 
-            if not any(
-                [self.supply_chain.nodes[_v]["step"] in self.sc_end for _v in _v_nodes]
-            ):
-                _methods = [
-                    {
-                        "cost_method": [
-                            getattr(
-                                self.cost_methods,
-                                self.supply_chain.nodes[edge[0]]["step_cost_method"],
-                            ),
-                            getattr(self.cost_methods, _transpo_cost),
-                        ],
-                        "cost": 0.0,
-                        "dist": -1.0,
-                        "route_id": None,
-                    }
-                    for edge in _edge_list
-                ]
+            # look up each node's processing cost method once rather than
+            # once per edge
+            _u_methods = {
+                n: self._method_by_name[self.supply_chain.nodes[n]["step_cost_method"]]
+                for n in _u_fids
+            }
+            _transpo_method = self._method_by_name[_transpo_cost]
+
+            # edges that end the supply chain also carry the processing cost
+            # of the destination node
+            if _v in self.sc_end:
+                _v_methods = {
+                    n: [
+                        self._method_by_name[
+                            self.supply_chain.nodes[n]["step_cost_method"]
+                        ]
+                    ]
+                    for n in _v_fids
+                }
             else:
-                _methods = [
-                    {
-                        "cost_method": [
-                            getattr(
-                                self.cost_methods,
-                                self.supply_chain.nodes[edge[0]]["step_cost_method"],
-                            ),
-                            getattr(self.cost_methods, _transpo_cost),
-                            getattr(
-                                self.cost_methods,
-                                self.supply_chain.nodes[edge[1]]["step_cost_method"],
-                            ),
-                        ],
-                        "cost": 0.0,
-                        "dist": -1.0,
-                        "route_id": None,
-                    }
-                    for edge in _edge_list
-                ]
+                _v_methods = {n: [] for n in _v_fids}
+
+            # find the route, if any, for all possible combinations of
+            # _u_nodes and _v_nodes
+            _routed = (
+                (_u_node, _v_node, _routes.get((_u_fids[_u_node], _v_fids[_v_node])))
+                for _u_node, _v_node in product(_u_fids, _v_fids)
+            )
 
-            # add these edges to the supply chain
+            # add the routed edges to the supply chain
             self.supply_chain.add_edges_from(
-                self.list_of_tuples(
-                    [edge[0] for edge in _edge_list],
-                    [edge[1] for edge in _edge_list],
-                    _methods,
+                (
+                    _u_node,
+                    _v_node,
+                    {
+                        "cost_method": [_u_methods[_u_node], _transpo_method]
+                        + _v_methods[_v_node],
+                        "cost": 0.0,
+                        "dist": _route[0],
+                        "route_id": _route[1],
+                    },
                 )
+                for _u_node, _v_node, _route in _routed
+                if _route is not None
             )
+
         if self.verbose > 0:
             print(
                 "Transport cost methods added at  %d s"
                 % np.round(time() - self.start_time, 0),
                 flush=True,
             )
-        # read in and process routes line by line
-        with open(self.routes_file, "r") as _route_file:
-            if self.verbose > 0:
-                print(
-                    "Adding route distances at        %d s"
-                    % np.round(time() - self.start_time, 0),
-                    flush=True,
-                )
+            print(
+                "Calculating edge costs at        %d s"
+                % np.round(time() - self.start_time, 0),
+                flush=True,
+            )
 
-            # Only read in columns relevant to CostGraph building
-            _reader = pd.read_csv(
-                _route_file,
-                usecols=[
-                    "source_facility_id",
-                    "source_facility_type",
-                    "destination_facility_id",
-                    "destination_facility_type",
-                    "total_vkmt",
-                    "route_id",
-                ],
-                chunksize=1,
+        self._build_csr()
+
+        # group edges that share the same cost methods so each method is
+        # called once per group on an array of edge distances. Distances and
+        # CSR positions do not change after the graph is built, so they are
+        # stored with the group.
+        _groups = {}
+        for u, v, data in self.supply_chain.edges(data=True):
+            _groups.setdefault(tuple(data["cost_method"]), []).append((u, v))
+        self._cost_groups = [
+            (
+                _methods,
+                _edges,
+                np.array([self.supply_chain.edges[edge]["dist"] for edge in _edges]),
+                np.array([self._csr_pos[edge] for edge in _edges], dtype=np.intp),
             )
-            _prev_line = None
+            for _methods, _edges in _groups.items()
+        ]
 
-            for _line in _reader:
-                if np.array_equal(_line, _prev_line):
-                    continue
+        # only groups with at least one cost method that can change over
+        # time are recalculated in update_costs
+        self._dynamic_cost_groups = [
+            _group
+            for _group in self._cost_groups
+            if any(f.__name__ not in STATIC_COST_METHODS for f in _group[0])
+        ]
 
-                _prev_line = _line
+        # Year and component mass are defined when CostGraph is instantiated
+        # and do not need to be updated during supply chain generation
+        self._calculate_costs(self.path_dict, self._cost_groups)
 
-                # find the source nodes for this route
-                _u = list(
-                    search_nodes(
-                        self.supply_chain,
-                        {
-                            "and": [
-                                {
-                                    "==": [
-                                        ("facility_id",),
-                                        _line["source_facility_id"].values[0],
-                                    ]
-                                },
-                                {"in": [("connects",), ["out", "bid"]]},
-                            ]
-                        },
-                    )
-                )
-
-                # loop thru all edges that connect to the source nodes
-                for u_node, v_node, data in self.supply_chain.edges(_u, data=True):
-                    # if the destination node facility ID matches the
-                    # destination facility ID in the routing dataset row,
-                    # apply the distance from the routing dataset to this edge
-                    if (
-                        self.supply_chain.nodes[v_node]["facility_id"]
-                        == _line["destination_facility_id"].values[0]
-                    ):
-                        if self.verbose > 1:
-                            print(
-                                "Adding ",
-                                str(_line["total_vkmt"].values[0]),
-                                " km between ",
-                                u_node,
-                                " and ",
-                                v_node,
-                            )
-                        data["dist"] = _line["total_vkmt"].values[0]
-                        data["route_id"] = _line["route_id"].values[0]
-
-        # After all of the route distances have been added, any edges that
-        # have a distance of -1 km are deleted from the network.
-        _all_edges = self.supply_chain.edges.data()
-        _remove_edges = []
-        for u, v, data in _all_edges:
-            if data["dist"] == -1.0:
-                if self.verbose > 1:
-                    print(f"Removing edge between {u} and {v}")
-                _remove_edges.append((u, v))
-        self.supply_chain.remove_edges_from(_remove_edges)
         if self.verbose > 0:
             print(
-                "Route distances added at         %d s"
+                "Supply chain graph is built at   %d s"
                 % np.round(time() - self.start_time, 0),
                 flush=True,
             )
-            print(
-                "Calculating edge costs at        %d s"
-                % np.round(time() - self.start_time, 0),
-                flush=True,
+
+    @staticmethod
+    def _has_stochastic_costs(path_dict: dict):
+        """
+        Checks whether any cost uncertainty is configured as stochastic. The
+        settings are not matched to individual cost methods, because a method
+        may read the settings of another step (e.g., blade_transpo uses the
+        segment transpo settings).
+
+        Parameters
+        ----------
+        path_dict : Dict
+            Dictionary of cost parameters passed to the cost methods.
+
+        Returns
+        -------
+        bool
+            True if any cost method may draw random values.
+        """
+        return any(
+            isinstance(_uncertainty, dict)
+            and _uncertainty.get("uncertainty") == "stochastic"
+            for _uncertainty in path_dict.get("cost uncertainty", {}).values()
+        )
+
+    @staticmethod
+    def _sum_costs(cost_methods: tuple, edge_dict: dict, edges: list):
+        """
+        Calls each cost method assigned to one or more edges and sums the
+        results.
+
+        Parameters
+        ----------
+        cost_methods : tuple
+            Cost methods assigned to the edges.
+        edge_dict : Dict
+            Dictionary of cost parameters passed to the cost methods.
+        edges : list
+            Edges the cost is calculated for, used in the error message.
+
+        Returns
+        -------
+        float or np.ndarray
+            Total cost of the edge(s).
+
+        Raises
+        ------
+        TypeError
+            If a cost method returns None.
+        """
+        _costs = [f(edge_dict) for f in cost_methods]
+        if any(_cost is None for _cost in _costs):
+            raise TypeError(
+                f"CostGraph: A cost method assigned to {edges} is returning None"
             )
 
-        for edge in self.supply_chain.edges():
-            if self.verbose > 1:
-                print("Calculating edge costs for ", edge)
+        return sum(_costs)
 
-            _edge_dict = self.path_dict.copy()
-            _edge_dict["vkmt"] = self.supply_chain.edges[edge]["dist"]
+    def _calculate_costs(self, path_dict: dict, cost_groups: list):
+        """
+        Calculates the cost of every edge in one or more cost-method groups
+        and stores it as the edge "cost" attribute and in the CSR cost array.
 
-            # Year and component mass are defined when CostGraph is instantiated
-            # and do not need to be updated during supply chain generation
-            try:
-                self.supply_chain.edges[edge]["cost"] = sum(
-                    [f(_edge_dict) for f in self.supply_chain.edges[edge]["cost_method"]]
-                )
-            except TypeError:
-                print(f'CostGraph: A cost method assigned to {edge} is returning None', flush=True)
-                raise TypeError 
+        If all cost methods are deterministic, each group is calculated at
+        once on an array of edge distances. If any cost uncertainty is
+        stochastic, every edge is calculated separately, in the order edges
+        were added, so that each edge gets its own random draws and seeded
+        runs are reproducible.
 
-        if self.verbose > 0:
-            print(
-                "Supply chain graph is built at   %d s"
-                % np.round(time() - self.start_time, 0),
-                flush=True,
+        Parameters
+        ----------
+        path_dict : Dict
+            Dictionary of cost parameters passed to the cost methods. The
+            vkmt value is replaced by each group's array of edge distances.
+        cost_groups : list
+            List of (cost methods, edges, distances, CSR positions) tuples.
+        """
+        _edge_dict = path_dict.copy()
+
+        if self._has_stochastic_costs(path_dict):
+            # _csr_order maps CSR positions back to the order edges were added
+            _edges_in_order = sorted(
+                (
+                    (_p, _methods, edge)
+                    for _methods, _edges, _dists, _pos in cost_groups
+                    for _p, edge in zip(_pos.tolist(), _edges)
+                ),
+                key=lambda e: self._csr_order[e[0]],
             )
+            for _p, _methods, edge in _edges_in_order:
+                _edge_dict["vkmt"] = self.supply_chain.edges[edge]["dist"]
+                _cost = self._sum_costs(_methods, _edge_dict, [edge])
+                self._csr_costs[_p] = _cost
+                self.supply_chain.edges[edge]["cost"] = _cost
+            return
+
+        for _methods, _edges, _dists, _pos in cost_groups:
+            if self.verbose > 1:
+                print("Calculating edge costs for ", _edges)
+
+            _edge_dict["vkmt"] = _dists
+            _costs = self._sum_costs(_methods, _edge_dict, _edges)
+
+            self._csr_costs[_pos] = _costs
+
+            for edge, _cost in zip(
+                _edges, np.broadcast_to(_costs, len(_edges)).tolist()
+            ):
+                self.supply_chain.edges[edge]["cost"] = _cost
 
     def choose_paths(self, source: str = None, crit: str = "cost"):
         """
@@ -776,6 +1033,80 @@ class CostGraph:
 
                 return _paths
 
+    def _neighbors_of_type(self, node: str, connect_to: str, upstream: bool):
+        """
+        Lists the upstream or downstream neighbors of a node whose names
+        start with connect_to. Node names begin with the processing step, so
+        connect_to may be a full step name or a prefix of one (e.g.,
+        "landfill" matches "landfilling" nodes). Results are cached.
+
+        Parameters
+        ----------
+        node : str
+            Name of a node in the supply chain.
+        connect_to : str
+            Facility type or processing step to filter the neighbors by.
+        upstream : bool
+            If True, list predecessors of the node; otherwise, successors.
+
+        Returns
+        -------
+        List[str]
+            Names of the matching neighbors, in adjacency order.
+        """
+        if (node, connect_to, upstream) not in self._typed_neighbors:
+            if upstream:
+                _neighbors = self.supply_chain.predecessors(node)
+            else:
+                _neighbors = self.supply_chain.successors(node)
+            self._typed_neighbors[(node, connect_to, upstream)] = [
+                n for n in _neighbors if n.startswith(connect_to)
+            ]
+
+        return self._typed_neighbors[(node, connect_to, upstream)]
+
+    def _nearest_neighbor(
+        self, node: str, connect_to: str, crit: str, upstream: bool
+    ):
+        """
+        Finds the "nearest" upstream or downstream neighbor of a node whose
+        name starts with connect_to. "Nearest" is determined according to the
+        crit parameter.
+
+        Parameters
+        ----------
+        node : str
+            Name of a node in the supply chain.
+        connect_to : str
+            Facility type or processing step of the neighbor.
+        crit : str
+            Edge attribute used to decide which neighbor is "nearest".
+        upstream : bool
+            If True, search predecessors of the node; otherwise, successors.
+
+        Returns
+        -------
+        str
+            Name of the nearest neighbor, or None if the node has no
+            neighbors of type connect_to. Ties go to the first neighbor in
+            adjacency order.
+        """
+        _neighbors = self._neighbors_of_type(node, connect_to, upstream)
+
+        if len(_neighbors) == 0:
+            return None
+        elif len(_neighbors) == 1:
+            # If there is only one option, no edges need to be compared
+            return _neighbors[0]
+        elif upstream:
+            return min(
+                _neighbors, key=lambda n: self.supply_chain.edges[n, node][crit]
+            )
+        else:
+            return min(
+                _neighbors, key=lambda n: self.supply_chain.edges[node, n][crit]
+            )
+
     def find_upstream_neighbor(
         self, node_id: int, connect_to: str = "manufacturing", crit: str = "dist"
     ):
@@ -803,30 +1134,26 @@ class CostGraph:
             connect to any nodes of the connect_to type.
         """
 
+        # Upstream neighbors are only re-evaluated when edge costs change
+        if (node_id, connect_to, crit) in self._upstream_cache:
+            return self._upstream_cache[(node_id, connect_to, crit)]
+
         # Check that the node_id exists in the supply chain.
         # If it doesn't, print a message and return None
-        if (
-            not node_id
-            in nx.get_node_attributes(self.supply_chain, name="facility_id").values()
-        ):
+        if node_id not in self._nodes_by_facility_id:
             print("Facility %d does not exist in CostGraph" % node_id, flush=True)
             return None
         else:
             # If node_id does exist in the supply chain, pull out the node name
-            _node = [
-                x
-                for x, y in self.supply_chain.nodes(data=True)
-                if y["facility_id"] == node_id and y["connects"] == "bid"
-            ][0]
+            _node = self._bid_node_by_facility_id[node_id]
 
-        # Get a list of all nodes with an outgoing edge that connects to this
+        # Find the "closest" node with an outgoing edge that connects to this
         # node_id, with the specified facility type
-        _upstream_nodes = [
-            n for n in self.supply_chain.predecessors(_node) if n.find(connect_to) != -1
-        ]
+        _nearest_upstream_node = self._nearest_neighbor(
+            _node, connect_to, crit, upstream=True
+        )
 
-        # Search the list for the "closest" node
-        if len(_upstream_nodes) == 0:
+        if _nearest_upstream_node is None:
             # If there are no upstream nodes of the correct type, print a
             # message and return None
             print(
@@ -835,23 +1162,12 @@ class CostGraph:
             )
             return None
 
-        elif len(_upstream_nodes) > 1:
-            # If there are multiple options, identify the nearest neighbor
-            # according to the crit(eria) parameter
-            _upstream_dists = [
-                self.supply_chain.edges[_up_n, _node][crit] for _up_n in _upstream_nodes
-            ]
-            _nearest_upstream_node = _upstream_nodes[
-                _upstream_dists.index(min(_upstream_dists))
-            ]
-            _nearest_facility_id = _nearest_upstream_node.split("_")[1]
-
-        else:
-            # If there is only one option, pull that node's facility_id directly
-            _nearest_facility_id = _upstream_nodes[0].split("_")[1]
-
         # Return the "closest" node's facility_id as an integer
-        return int(_nearest_facility_id)
+        _nearest_facility_id = int(
+            self.supply_chain.nodes[_nearest_upstream_node]["facility_id"]
+        )
+        self._upstream_cache[(node_id, connect_to, crit)] = _nearest_facility_id
+        return _nearest_facility_id
 
     def find_downstream(
         self,
@@ -890,134 +1206,50 @@ class CostGraph:
             node.
         """
 
-        # Check that the node_id exists in the supply chain.
+        # Check that the starting node exists in the supply chain.
         # If it doesn't, print a message and return None
         # if a facility_id was provided, use that to locate the node
         if facility_id is not None:
-            if (
-                not facility_id
-                in nx.get_node_attributes(
-                    self.supply_chain, name="facility_id"
-                ).values()
-            ):
+            if facility_id not in self._nodes_by_facility_id:
                 print(f"Facility {facility_id} does not exist in CostGraph", flush=True)
                 return None
-            else:
-                # If facility_id does exist in the supply chain, pull out the
-                # node name
-                _node = [
-                    x
-                    for x, y in self.supply_chain.nodes(data=True)
-                    if y["facility_id"] == facility_id
-                ][0]
-                # Get a list of all nodes with an outgoing edge that connects
-                # to this facility_id, with the specified facility type
-                _downst_nodes = [
-                    n
-                    for n in self.supply_chain.successors(_node)
-                    if n.find(connect_to) != -1
-                ]
-                _upstream_dists = [
-                    self.supply_chain.edges[_node, _lnd_n][crit]
-                    for _lnd_n in _downst_nodes
-                ]
-
-                # Search the list for the "closest" node
-                if len(_downst_nodes) == 0:
-                    # If there are no upstream nodes of the correct type, print a
-                    # message and return None
-                    print(
-                        f"Node {node_name} does not have any downstream neighbors of type {connect_to}",
-                        flush=True,
-                    )
-                    return None
-                elif len(_downst_nodes) > 1:
-                    # If there are multiple options, identify the nearest neighbor
-                    # according to the crit(eria) parameter
-
-                    _nearest_downst_node = _downst_nodes[
-                        _upstream_dists.index(min(_upstream_dists))
-                    ]
-                    _nearest_route_id = self.supply_chain.edges[
-                        _node, _nearest_downst_node
-                    ]["route_id"]
-
-                    if not get_dist:
-                        return _nearest_downst_node
-                    else:
-                        return (
-                            _nearest_downst_node,
-                            min(_upstream_dists),
-                            _nearest_route_id,
-                        )
-                else:
-                    # If there is only one option, pull that node's facility_id directly
-                    _nearest_downst_node = _downst_nodes[0]
-                    _upstream_dist = _upstream_dists[0]
-                    _nearest_route_id = self.supply_chain.edges[
-                        _node, _nearest_downst_node
-                    ]["route_id"]
-                    if not get_dist:
-                        return _nearest_downst_node
-                    else:
-                        return _nearest_downst_node, _upstream_dist, _nearest_route_id
-
+            # If facility_id does exist in the supply chain, start from the
+            # facility's first node
+            _node = self._nodes_by_facility_id[facility_id][0]
         elif node_name is not None:
-            if not node_name in self.supply_chain.nodes:
+            if node_name not in self.supply_chain.nodes:
                 print(f"Node {node_name} does not exist in CostGraph", flush=True)
                 return None
-            else:
-                # Get a list of all nodes with an outgoing edge that connects
-                # to this facility_id, with the specified facility type
-                _downst_nodes = [
-                    n
-                    for n in self.supply_chain.successors(node_name)
-                    if n.find(connect_to) != -1
-                ]
-                _upstream_dists = [
-                    self.supply_chain.edges[node_name, _lnd_n][crit]
-                    for _lnd_n in _downst_nodes
-                ]
-
-                if len(_downst_nodes) > 1:
-                    _nearest_downst_node = _downst_nodes[
-                        _upstream_dists.index(min(_upstream_dists))
-                    ]
-                    _nearest_route_id = self.supply_chain.edges[
-                        node_name, _nearest_downst_node
-                    ]["route_id"]
-
-                    if not get_dist:
-                        return _nearest_downst_node
-                    else:
-                        return (
-                            _nearest_downst_node,
-                            min(_upstream_dists),
-                            _nearest_route_id,
-                        )
-                elif len(_downst_nodes) == 1:
-                    _nearest_downst_node = _downst_nodes[0]
-                    _nearest_route_id = self.supply_chain.edges[
-                        node_name, _nearest_downst_node
-                    ]["route_id"]
-                    if not get_dist:
-                        return _nearest_downst_node
-                    else:
-                        return (
-                            _nearest_downst_node,
-                            _upstream_dists[0],
-                            _nearest_route_id,
-                        )
-                else:
-                    print(
-                        f"Node {node_name} does not have any downstream neighbors of type {connect_to}",
-                        flush=True,
-                    )
-                    return None
+            _node = node_name
         else:
             print(f"No node identifier provided to find_downstream", flush=True)
             return None
 
+        # Find the "closest" node with an incoming edge from the starting
+        # node, with the specified facility type
+        _nearest_downst_node = self._nearest_neighbor(
+            _node, connect_to, crit, upstream=False
+        )
+
+        if _nearest_downst_node is None:
+            # If there are no downstream nodes of the correct type, print a
+            # message and return None
+            print(
+                f"Node {_node} does not have any downstream neighbors of type {connect_to}",
+                flush=True,
+            )
+            return None
+
+        if not get_dist:
+            return _nearest_downst_node
+        else:
+            _nearest_edge = self.supply_chain.edges[_node, _nearest_downst_node]
+            return (
+                _nearest_downst_node,
+                _nearest_edge[crit],
+                _nearest_edge["route_id"],
+            )
+
     def update_costs(self, path_dict):
         """
         Re-calculates all edge costs based on arguments passed to cost methods.
@@ -1039,12 +1271,14 @@ class CostGraph:
                 flush=True,
             )
 
-        for edge in self.supply_chain.edges():
-            _edge_dict = path_dict.copy()
-            _edge_dict["vkmt"] = self.supply_chain.edges[edge]["dist"]
-            self.supply_chain.edges[edge]["cost"] = sum(
-                [f(_edge_dict) for f in self.supply_chain.edges[edge]["cost_method"]]
-            )
+        # edges whose cost methods are all static keep their initial cost
+        self._calculate_costs(path_dict, self._dynamic_cost_groups)
+
+        # cached edge weights, shortest paths and neighbors are stale
+        self._csr_graphs = {}
+        self._nearest_cache = {}
+        self._bol_lengths = {}
+        self._upstream_cache = {}
 
         if self.verbose > 0:
             print(
@@ -1058,18 +1292,24 @@ class CostGraph:
         Performs postprocessing on CostGraph outputs being saved to file and
         saves to user-specified filenames and directories
         """
-        try:
-            _out = pd.DataFrame(
-                self.pathway_crit_history
-                ).explode(
-                    column=['destination_facility_id','eol_pathway_criterion']
-                    ).drop_duplicates(
-                        ignore_index=True
-                        )
-            _out["run"] = self.run
-            with open(self.pathway_crit_history_filename, "a") as f:
-                _out.to_csv(
-                    f, mode="a", header=f.tell() == 0, index=False, lineterminator="\n"
-                )
-        except KeyError:
+        if len(self._crit_history["year"]) == 0:
             print(f"CostGraph: pathway_crit_history is empty; no end of life flows were simulated")
+            return
+
+        # flatten the list-valued columns and repeat the other columns once
+        # per destination, rather than exploding a DataFrame of lists
+        _lens = [len(_dest) for _dest in self._crit_history["destination_facility_id"]]
+        _rows = np.repeat(np.arange(len(_lens)), _lens)
+        _out = pd.DataFrame(
+            {
+                _col: pd.Series(list(chain.from_iterable(_values)), dtype=object)
+                if _col in ("destination_facility_id", "eol_pathway_criterion")
+                else pd.Series(_values).to_numpy()[_rows]
+                for _col, _values in self._crit_history.items()
+            }
+        ).drop_duplicates(ignore_index=True)
+        _out["run"] = self.run
+        with open(self.pathway_crit_history_filename, "a") as f:
+            _out.to_csv(
+                f, mode="a", header=f.tell() == 0, index=False, lineterminator="\n"
+            )
@@ -248,17 +248,15 @@ class TechUnitLocations(Data):
 
     No manual changes are needed to the raw dataset before it is processed.
     """
-    COLUMNS = ({'name': 'eia_id', 'type': float, 'index': True, 'backfill': '-1'},
+    COLUMNS = ({'name': 'eia_id', 'type': float, 'index': True, 'backfill': -1},
                {'name': 't_state', 'type': str, 'index': False, 'backfill': None},
                {'name': 't_county', 'type': str, 'index': False, 'backfill': None},
                {'name': 'p_name', 'type': str, 'index': False, 'backfill': None},
-               {'name': 'p_year', 'type': float, 'index': False, 'backfill': '-1'},
-               {'name': 'p_tnum', 'type': float, 'index': False, 'backfill': '-1'},
+               {'name': 'p_year', 'type': float, 'index': False, 'backfill': -1},
+               {'name': 'p_tnum', 'type': float, 'index': False, 'backfill': -1},
                {'name': 't_model', 'type': str, 'index': False, 'backfill': None},
-               {'name': 't_fips', 'type': int, 'index': False, 'backfill': None},
                {'name': 'xlong', 'type': float, 'index': False, 'backfill': None},
                {'name': 'ylat', 'type': float, 'index': False, 'backfill': None},
-               {'name': 'p_cap', 'type': float, 'index': False, 'backfill': None},
                {'name': 't_cap', 'type': float, 'index': False, 'backfill': None}
                )
 
@@ -301,8 +299,8 @@ class LandfillLocations(Data):
                {'name': 'Longitude', 'type': float, 'index': False, 'backfill': None},
                {'name': 'City', 'type': str, 'index': False, 'backfill': None},
                {'name': 'County', 'type': str, 'index': False, 'backfill': None},
-               {'name': 'Current Landfill Status', 'type': str, 'index': False, 'backfill': None},
-               {'name': 'Landfill Closure Year', 'type': str, 'index': False, 'backfill': '-1'},
+               {'name': 'Current Landfill Status', 'type': 'category', 'index': False, 'backfill': None},
+               {'name': 'Landfill Closure Year', 'type': 'Int16', 'index': False, 'backfill': -1},
                )
 
     def __init__(self, df=None, fpath=None,
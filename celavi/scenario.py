@@ -359,7 +359,7 @@ class Scenario:
                 component_total_mass.year == start_year, "mass_tonnes"
             ].values[0]
             self.netw.update_costs(self.netw.path_dict)
-            self.netw.pathway_crit_history = list()
+            self.netw.reset_crit_history()
 
             self.lca.run = self.run
 
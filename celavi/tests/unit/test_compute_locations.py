@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from celavi.compute_locations import ComputeLocations
+
+
+@pytest.fixture()
+def raw_location_files(tmp_path):
+    turbines = pd.DataFrame(
+        [
+            # plant 101 spans two counties; only the first county is kept
+            (101.0, "CO", "Weld", "P101", 2005.0, 3.0, "A", -104.0, 40.0, 1500.0),
+            (101.0, "CO", "Weld", "P101", 2005.0, 3.0, "A", -104.2, 40.2, 1500.0),
+            (101.0, "CO", "Adams", "P101", 2005.0, 3.0, "A", -104.9, 39.9, 1500.0),
+            # a turbine without coordinates does not move the plant location
+            (102.0, "TX", "Nolan", "P102", 2010.0, 2.0, "B", -100.4, 32.3, 2000.0),
+            (102.0, "TX", "Nolan", "P102", 2010.0, 2.0, "B", np.nan, 32.5, 2000.0),
+            (105.0, "IA", "Story", "P105", 2015.0, 1.0, "C", -93.5, 42.0, 2500.0),
+            # excluded: outside the contiguous U.S., installed before the
+            # start year, no eia_id, and on Nantucket
+            (103.0, "HI", "Maui", "P103", 2008.0, 1.0, "A", -156.3, 20.8, 1500.0),
+            (104.0, "CO", "Weld", "P104", 1995.0, 1.0, "A", -104.5, 40.5, 600.0),
+            (np.nan, "TX", "Nolan", "P0", 2012.0, 1.0, "B", -100.1, 32.1, 2000.0),
+            (106.0, "MA", "Nantucket", "P106", 2012.0, 1.0, "A", -70.1, 41.3, 1500.0),
+        ],
+        columns=[
+            "eia_id",
+            "t_state",
+            "t_county",
+            "p_name",
+            "p_year",
+            "p_tnum",
+            "t_model",
+            "xlong",
+            "ylat",
+            "t_cap",
+        ],
+    ).assign(t_fips=0, p_cap=0.0)
+    landfills = pd.DataFrame(
+        [
+            (201, "CO", 39.7, -105.0, "Denver", "Denver", "Open", 2030),
+            (202, "TX", 31.0, -99.0, "Austin", "Travis", "Closed", 2001),
+            (203, "IA", np.nan, -93.0, "Ames", "Story", "Open", 2040),
+            # shares its id with a power plant and is renumbered
+            (102, "TX", 32.0, -101.0, "Abilene", "Taylor", "Open", 2035),
+        ],
+        columns=[
+            "Landfill ID",
+            "State",
+            "Latitude",
+            "Longitude",
+            "City",
+            "County",
+            "Current Landfill Status",
+            "Landfill Closure Year",
+        ],
+    )
+    other_facilities = pd.DataFrame(
+        [
+            (301, "recycling", 39.8, -104.8, "USA", "CO", "Adams", ""),
+            (302, "cement plant", 31.5, -97.1, "USA", "TX", "McLennan", ""),
+            (303, "manufacturing", 41.6, -93.6, "USA", "IA", "Polk", ""),
+        ],
+        columns=[
+            "facility_id",
+            "facility_type",
+            "lat",
+            "long",
+            "region_id_1",
+            "region_id_2",
+            "region_id_3",
+            "region_id_4",
+        ],
+    )
+    lookup_facility_type = pd.DataFrame(
+        [["power plant"], ["landfill"], ["recycling"], ["cement plant"], ["manufacturing"]]
+    )
+    standard_scenarios = pd.DataFrame(
+        [
+            ("CO", 2020, 5000.0),
+            ("CO", 2022, 5600.0),
+            ("CO", 2024, 5400.0),
+            ("TX", 2020, 30000.0),
+            ("TX", 2022, 31000.0),
+            ("TX", 2024, 33500.0),
+        ],
+        columns=["state", "t", "wind-ons_MW"],
+    )
+
+    turbines.to_csv(tmp_path / "turbines.csv", index=False)
+    landfills.to_csv(tmp_path / "landfills.csv", index=False)
+    other_facilities.to_csv(tmp_path / "other_facilities.csv", index=False)
+    lookup_facility_type.to_csv(
+        tmp_path / "lookup_facility_type.csv", index=False, header=False
+    )
+    standard_scenarios.to_csv(tmp_path / "standard_scenarios.csv", index=False)
+
+    return tmp_path
+
+
+@pytest.fixture()
+def a_compute_locations(raw_location_files):
+    return ComputeLocations(
+        start_year=2000,
+        power_plant_locations=str(raw_location_files / "turbines.csv"),
+        landfill_locations=str(raw_location_files / "landfills.csv"),
+        other_facility_locations=str(raw_location_files / "other_facilities.csv"),
+        transportation_graph=None,
+        node_locations=None,
+        lookup_facility_type=str(raw_location_files / "lookup_facility_type.csv"),
+        technology_data_filename=str(raw_location_files / "number_of_technology_units.csv"),
+        standard_scenarios_filename=str(raw_location_files / "standard_scenarios.csv"),
+    )
+
+
+def test_wind_power_plant(a_compute_locations):
+    plants = a_compute_locations.wind_power_plant()
+
+    assert plants["facility_id"].tolist() == [101, 102, 105]
+    assert plants["facility_type"].tolist() == ["power plant"] * 3
+    # region identifiers are returned as plain strings
+    assert plants["region_id_2"].dtype == object
+    assert plants["region_id_3"].dtype == object
+    assert plants["region_id_2"].tolist() == ["CO", "TX", "IA"]
+    assert plants["region_id_3"].tolist() == ["Adams", "Nolan", "Story"]
+    # plant 101 takes the mean location of its turbines in the first county
+    assert plants["long"].tolist() == pytest.approx([-104.9, -100.4, -93.5])
+    assert plants["lat"].tolist() == pytest.approx([39.9, 32.4, 42.0])
+
+
+def test_join_facilities(a_compute_locations, raw_location_files):
+    a_compute_locations.join_facilities(str(raw_location_files / "locations.csv"))
+
+    # expected outputs of the original join_facilities implementation. The
+    # landfill sharing an id with plant 102 is renumbered, and one future
+    # power plant per state is placed at the mean location of its plants.
+    expected_locations = pd.DataFrame(
+        [
+            (101, "power plant", 39.9, -104.9, "USA", "CO", "Adams", np.nan),
+            (102, "power plant", 32.4, -100.4, "USA", "TX", "Nolan", np.nan),
+            (105, "power plant", 42.0, -93.5, "USA", "IA", "Story", np.nan),
+            (201, "landfill", 39.7, -105.0, "USA", "CO", "Denver", "Denver"),
+            (301, "recycling", 39.8, -104.8, "USA", "CO", "Adams", np.nan),
+            (302, "cement plant", 31.5, -97.1, "USA", "TX", "McLennan", np.nan),
+            (303, "manufacturing", 41.6, -93.6, "USA", "IA", "Polk", np.nan),
+            (304, "landfill", 32.0, -101.0, "USA", "TX", "Taylor", "Abilene"),
+            (305, "power plant", 39.8, -104.9, "USA", "CO", np.nan, np.nan),
+            (306, "power plant", 31.966667, -99.5, "USA", "TX", np.nan, np.nan),
+        ],
+        columns=[
+            "facility_id",
+            "facility_type",
+            "lat",
+            "long",
+            "region_id_1",
+            "region_id_2",
+            "region_id_3",
+            "region_id_4",
+        ],
+    )
+    expected_technology_units = pd.DataFrame(
+        [
+            (2005, 101, 1.0, 1500.0, np.nan),
+            (2010, 102, 1.0, 2000.0, np.nan),
+            (2015, 105, 1.0, 2500.0, np.nan),
+            (2022, 305, 188.0, 3200.0, "CO_future_cap"),
+            (2022, 306, 313.0, 3200.0, "TX_future_cap"),
+            (2024, 306, 736.0, 3400.0, "TX_future_cap"),
+        ],
+        columns=["year", "facility_id", "n_technology", "t_cap", "p_name"],
+    )
+
+    pd.testing.assert_frame_equal(
+        pd.read_csv(raw_location_files / "locations.csv"),
+        expected_locations,
+        check_dtype=False,
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_csv(raw_location_files / "number_of_technology_units.csv"),
+        expected_technology_units,
+        check_dtype=False,
+    )
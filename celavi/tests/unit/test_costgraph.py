@@ -0,0 +1,325 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from celavi import costgraph
+from celavi.costgraph import CostGraph
+
+
+class ToyCostMethods:
+    """
+    Array-safe cost methods for a toy supply chain. Landfilling and
+    coprocessing costs increase over time; manufacturing and segment
+    transport draw a random cost when their uncertainty is stochastic.
+    """
+
+    def __init__(self, start_year, seed, run):
+        self.start_year = start_year
+        self.seed = seed
+        self.run = run
+
+    @staticmethod
+    def zero_method(path_dict):
+        return 0.0
+
+    def manufacturing(self, path_dict):
+        _uncertainty = path_dict["cost uncertainty"].get("manufacturing", {})
+        if _uncertainty.get("uncertainty") == "stochastic":
+            return 10.0 + self.seed.random()
+        return 10.0
+
+    def landfilling(self, path_dict):
+        return 20.0 + (path_dict["year"] - self.start_year)
+
+    def segmenting(self, path_dict):
+        return 5.0
+
+    def coarse_grinding(self, path_dict):
+        return 12.0
+
+    def coprocessing(self, path_dict):
+        return -60.0 + 10.0 * (path_dict["year"] - self.start_year)
+
+    def shred_transpo(self, path_dict):
+        return path_dict["vkmt"] / 10.0
+
+    def segment_transpo(self, path_dict):
+        _uncertainty = path_dict["cost uncertainty"].get("segment transpo", {})
+        if _uncertainty.get("uncertainty") == "stochastic":
+            return path_dict["vkmt"] / 10.0 + self.seed.random()
+        return path_dict["vkmt"] / 10.0
+
+    def blade_transpo(self, path_dict):
+        return self.segment_transpo(path_dict)
+
+
+@pytest.fixture()
+def supply_chain_files(tmp_path):
+    locations = pd.DataFrame(
+        [
+            (1, "manufacturing"),
+            (2, "manufacturing"),
+            (10, "power plant"),
+            (20, "landfill"),
+            (21, "landfill"),
+            (30, "recycling"),
+            (40, "cement plant"),
+        ],
+        columns=["facility_id", "facility_type"],
+    ).assign(
+        lat=40.0,
+        long=-100.0,
+        region_id_1="USA",
+        region_id_2="CO",
+        region_id_3="",
+        region_id_4="",
+    )
+    step_costs = pd.DataFrame(
+        [
+            (1, "manufacturing", "manufacturing", "out"),
+            (2, "manufacturing", "manufacturing", "out"),
+            (10, "in use", "zero_method", "bid"),
+            (20, "landfilling", "landfilling", "in"),
+            (21, "landfilling", "landfilling", "in"),
+            (30, "segmenting", "segmenting", "in"),
+            (30, "coarse grinding", "coarse_grinding", "out"),
+            (40, "coprocessing", "coprocessing", "in"),
+        ],
+        columns=["facility_id", "step", "step_cost_method", "connects"],
+    )
+    fac_edges = pd.DataFrame(
+        [
+            ("recycling", "segmenting", "coarse grinding"),
+            ("recycling", "coarse grinding", np.nan),
+            ("power plant", "in use", np.nan),
+        ],
+        columns=["facility_type", "step", "next_step"],
+    )
+    transpo_edges = pd.DataFrame(
+        [
+            ("manufacturing", "in use", "shred_transpo"),
+            ("in use", "landfilling", "shred_transpo"),
+            ("in use", "segmenting", "blade_transpo"),
+            ("coarse grinding", "coprocessing", "shred_transpo"),
+            ("coarse grinding", "landfilling", "shred_transpo"),
+        ],
+        columns=["u_step", "v_step", "transpo_cost_method"],
+    )
+    # there is no route from the recycling facility to landfill 21
+    routes = pd.DataFrame(
+        [
+            (1, 10, 100.0, "r1"),
+            (2, 10, 150.0, "r2"),
+            (10, 20, 50.0, "r3"),
+            (10, 21, 30.0, "r4"),
+            (10, 30, 20.0, "r5"),
+            (30, 40, 10.0, "r6"),
+            (30, 20, 5.0, "r7"),
+        ],
+        columns=[
+            "source_facility_id",
+            "destination_facility_id",
+            "total_vkmt",
+            "route_id",
+        ],
+    )
+
+    files = {
+        "locations_file": locations,
+        "step_costs_file": step_costs,
+        "fac_edges_file": fac_edges,
+        "transpo_edges_file": transpo_edges,
+        "routes_file": routes,
+    }
+    for name, df in files.items():
+        df.to_csv(tmp_path / f"{name}.csv", index=False)
+
+    return {
+        **{name: str(tmp_path / f"{name}.csv") for name in files},
+        "pathway_crit_history_filename": str(tmp_path / "pathway_crit_history.csv"),
+    }
+
+
+@pytest.fixture()
+def make_costgraph(supply_chain_files, monkeypatch):
+    monkeypatch.setattr(costgraph, "CostMethods", ToyCostMethods)
+
+    def _make_costgraph(cost_uncertainty=None):
+        return CostGraph(
+            **supply_chain_files,
+            circular_components=["blade"],
+            component_initial_mass=1.0,
+            path_dict={"cost uncertainty": cost_uncertainty or {}},
+            sc_end=["landfilling"],
+            sc_out_circ=["coprocessing"],
+            year=2000,
+            start_year=2000,
+            random_state=np.random.default_rng(13),
+        )
+
+    return _make_costgraph
+
+
+@pytest.fixture()
+def a_costgraph(make_costgraph):
+    return make_costgraph()
+
+
+def test_routed_edges(a_costgraph):
+    edges = a_costgraph.supply_chain.edges
+    # facilities without a route between them are not connected
+    assert ("coarse grinding_30", "landfilling_21") not in edges
+    assert ("manufacturing_1", "landfilling_20") not in edges
+    assert edges["manufacturing_1", "in use_10"]["dist"] == 100.0
+    assert edges["manufacturing_1", "in use_10"]["route_id"] == "r1"
+    assert edges["coarse grinding_30", "landfilling_20"]["dist"] == 5.0
+    assert edges["coarse grinding_30", "landfilling_20"]["route_id"] == "r7"
+    # intra-facility edges have no distance or route
+    assert edges["segmenting_30", "coarse grinding_30"]["dist"] == 0.0
+    assert edges["segmenting_30", "coarse grinding_30"]["route_id"] is None
+
+
+def test_edge_costs(a_costgraph):
+    edges = a_costgraph.supply_chain.edges
+    # manufacturing plus transport
+    assert edges["manufacturing_1", "in use_10"]["cost"] == pytest.approx(20.0)
+    assert edges["manufacturing_2", "in use_10"]["cost"] == pytest.approx(25.0)
+    # transport plus landfilling at the end of the supply chain
+    assert edges["in use_10", "landfilling_20"]["cost"] == pytest.approx(25.0)
+    assert edges["in use_10", "segmenting_30"]["cost"] == pytest.approx(2.0)
+    # grinding plus transport plus coprocessing revenue
+    assert edges["coarse grinding_30", "coprocessing_40"]["cost"] == pytest.approx(
+        -47.0
+    )
+    assert edges["segmenting_30", "coarse grinding_30"]["cost"] == pytest.approx(5.0)
+
+
+def test_stochastic_costs_drawn_per_edge(make_costgraph):
+    netw = make_costgraph(
+        {
+            "manufacturing": {"uncertainty": "stochastic"},
+            "segment transpo": {"uncertainty": "stochastic"},
+        }
+    )
+    edges = netw.supply_chain.edges
+    # every edge gets its own random draw, in the order edges were added;
+    # blade_transpo draws through the segment transpo settings
+    draws = np.random.default_rng(13).random(3)
+    assert edges["manufacturing_1", "in use_10"]["cost"] == pytest.approx(
+        20.0 + draws[0]
+    )
+    assert edges["manufacturing_2", "in use_10"]["cost"] == pytest.approx(
+        25.0 + draws[1]
+    )
+    assert edges["in use_10", "segmenting_30"]["cost"] == pytest.approx(
+        2.0 + draws[2]
+    )
+
+
+def test_cost_method_returning_none(make_costgraph, monkeypatch):
+    monkeypatch.setattr(ToyCostMethods, "segmenting", lambda self, path_dict: None)
+    with pytest.raises(TypeError, match="returning None"):
+        make_costgraph()
+
+
+def test_find_nearest_negative_edge(a_costgraph):
+    assert a_costgraph._path_method("cost") == "bellman-ford"
+
+    nearest, length, path = a_costgraph.find_nearest("in use_10", crit="cost")
+
+    assert nearest == "coprocessing_40"
+    assert length == pytest.approx(-40.0)
+    assert path == [
+        ("in use_10", 1, 0.0, None),
+        ("segmenting_30", 1, 20.0, "r5"),
+        ("coarse grinding_30", 1, 0.0, None),
+        ("coprocessing_40", 1, 10.0, "r6"),
+    ]
+
+    # destinations are listed in node order, not by path length
+    history = a_costgraph._crit_history
+    assert history["eol_pathway_type"] == ["landfilling", "coprocessing"]
+    assert history["destination_facility_id"] == [
+        ["landfilling_20", "landfilling_21"],
+        ["coprocessing_40"],
+    ]
+    assert history["eol_pathway_criterion"] == [
+        pytest.approx([25.0, 23.0]),
+        pytest.approx([-40.0]),
+    ]
+    assert history["bol_pathway_criterion"] == pytest.approx([20.0, 20.0])
+
+
+def test_find_nearest_cached(a_costgraph):
+    first = a_costgraph.find_nearest("in use_10", crit="cost")
+    assert ("in use_10", "cost") in a_costgraph._nearest_cache
+
+    # a repeated query returns the cached result and is still recorded in the
+    # pathway history
+    assert a_costgraph.find_nearest("in use_10", crit="cost") == first
+    assert a_costgraph._crit_history["eol_pathway_type"] == [
+        "landfilling",
+        "coprocessing",
+        "landfilling",
+        "coprocessing",
+    ]
+
+
+def test_update_costs_invalidates_paths(a_costgraph):
+    assert a_costgraph.find_nearest("in use_10", crit="cost")[0] == "coprocessing_40"
+
+    path_dict = dict(a_costgraph.path_dict, year=2010)
+    a_costgraph.update_costs(path_dict)
+
+    edges = a_costgraph.supply_chain.edges
+    assert edges["in use_10", "landfilling_20"]["cost"] == pytest.approx(35.0)
+    assert edges["coarse grinding_30", "coprocessing_40"]["cost"] == pytest.approx(
+        53.0
+    )
+    assert a_costgraph._nearest_cache == {}
+    assert a_costgraph._path_method("cost") == "dijkstra"
+
+    nearest, length, path = a_costgraph.find_nearest("in use_10", crit="cost")
+    assert nearest == "landfilling_21"
+    assert length == pytest.approx(33.0)
+    assert [node for node, _, _, _ in path] == ["in use_10", "landfilling_21"]
+
+
+def test_find_upstream_neighbor(a_costgraph):
+    assert a_costgraph.find_upstream_neighbor(10) == 1
+    assert a_costgraph.find_upstream_neighbor(10, crit="cost") == 1
+    assert a_costgraph._upstream_cache[(10, "manufacturing", "dist")] == 1
+    assert a_costgraph.find_upstream_neighbor(99) is None
+    assert a_costgraph.find_upstream_neighbor(10, connect_to="recycling") is None
+    # unsuccessful lookups are not cached
+    assert (10, "recycling", "dist") not in a_costgraph._upstream_cache
+
+
+def test_find_downstream(a_costgraph):
+    assert a_costgraph.find_downstream(facility_id=10) == "landfilling_21"
+    assert a_costgraph.find_downstream(facility_id=10, get_dist=True) == (
+        "landfilling_21",
+        30.0,
+        "r4",
+    )
+    assert a_costgraph.find_downstream(
+        node_name="coarse grinding_30", connect_to="coprocessing", get_dist=True
+    ) == ("coprocessing_40", 10.0, "r6")
+    assert a_costgraph.find_downstream(node_name="coarse grinding_30") == (
+        "landfilling_20"
+    )
+    assert a_costgraph.find_downstream(facility_id=40) is None
+    assert a_costgraph.find_downstream(node_name="in use_99") is None
+
+
+def test_pathway_crit_history(a_costgraph):
+    assert a_costgraph.pathway_crit_history.empty
+
+    a_costgraph.find_nearest("in use_10", crit="cost")
+    history = a_costgraph.pathway_crit_history
+    assert list(history.columns) == list(costgraph.PATHWAY_CRIT_HISTORY_COLUMNS)
+    assert history["eol_pathway_type"].tolist() == ["landfilling", "coprocessing"]
+    assert history["source_facility_id"].tolist() == [10, 10]
+
+    a_costgraph.reset_crit_history()
+    assert a_costgraph.pathway_crit_history.empty
@@ -23,16 +23,15 @@ setuptools.setup(
         "pandas",
         "matplotlib",
         "numpy",
+        "scipy",
         "networkx",
         "graphviz",
         "simpy",
-	    "networkx-query",
         "olca-ipc==0.0.10",
         "pyutilib",
         "joblib",
         "plotly",
         "kaleido==0.1.0.post1",
-        "scikit-learn",
         "PyYAML",
         "sphinx-rtd-theme"
     ]